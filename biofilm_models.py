@@ -1,56 +1,181 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 
-# Configure TensorFlow logging/CPU backend before importing tensorflow.
+# Configure TensorFlow logging/CPU backend before tensorflow is imported.
 os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
 os.environ.setdefault("TF_ENABLE_ONEDNN_OPTS", "0")
 
 import numpy as np
 import joblib
-import tensorflow as tf
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import LSTM, Dense, Dropout
-from sklearn.ensemble import RandomForestRegressor
+from threadpoolctl import threadpool_limits
+from sklearn.ensemble import HistGradientBoostingRegressor
 import xgboost as xgb
 
-tf.get_logger().setLevel("ERROR")
+
+def _import_tf():
+    # TensorFlow is imported lazily: the tree models and the TFLite path never
+    # need it, and the import alone takes seconds on small devices.
+    import tensorflow as tf
+    tf.get_logger().setLevel("ERROR")
+    return tf
+
+
+class FastMinMax:
+    """Minimal drop-in for ``sklearn.preprocessing.MinMaxScaler`` (range 0-1).
+
+    Plain NumPy min/max without sklearn's input validation and copies. It
+    exposes the same fitted attributes (``data_min_``, ``data_max_``,
+    ``scale_``, ``min_``), so code reading a pickled scaler works with either.
+    """
+
+    def fit(self, X):
+        X = np.asarray(X)
+        self.data_min_ = X.min(axis=0)
+        self.data_max_ = X.max(axis=0)
+        data_range = self.data_max_ - self.data_min_
+        # Constant columns map to 0, as in sklearn
+        self.scale_ = 1.0 / np.where(data_range == 0, 1, data_range).astype(X.dtype)
+        self.min_ = -self.data_min_ * self.scale_
+        return self
+
+    def transform(self, X):
+        return np.asarray(X) * self.scale_ + self.min_
+
+    def fit_transform(self, X):
+        return self.fit(X).transform(X)
+
+    def inverse_transform(self, X):
+        return (np.asarray(X) - self.min_) / self.scale_
+
 
 class HybridBiofilmPredictor:
     def __init__(self):
-        self.rf_model = RandomForestRegressor(n_estimators=100, max_depth=10, random_state=42)
-        self.xgb_model = xgb.XGBRegressor(n_estimators=100, max_depth=6, learning_rate=0.1, random_state=42)
+        # Histogram gradient boosting in the first tree slot: much faster per-row
+        # inference and a smaller file than a 100-tree random forest. The
+        # rf_model name / _rf.pkl file are kept for existing callers.
+        self.rf_model = HistGradientBoostingRegressor(max_iter=200, max_depth=10, learning_rate=0.05, random_state=42)
+        # Histogram tree method; set XGB_DEVICE=cuda to build trees on the GPU.
+        self.xgb_model = xgb.XGBRegressor(
+            n_estimators=100, max_depth=6, learning_rate=0.1,
+            tree_method='hist', device=os.environ.get("XGB_DEVICE", "cpu"),
+            random_state=42)
+        self._booster = None
         self.lstm_model = None
+        self._lstm_infer = None
         self.is_trained = False
         
     def build_lstm(self, input_shape):
-        model = Sequential([
-            LSTM(64, return_sequences=True, input_shape=input_shape),
-            Dropout(0.2),
-            LSTM(32),
-            Dropout(0.2),
-            Dense(16, activation='relu'),
-            Dense(1, activation='linear')
-        ])
+        tf = _import_tf()
+        from tensorflow.keras.models import Sequential
+        from tensorflow.keras.layers import LSTM, Dense, Dropout
+
+        # Keras only dispatches to the fused CuDNN kernel when the LSTM keeps
+        # these settings, so pin them explicitly.
+        cudnn_kwargs = dict(activation='tanh', recurrent_activation='sigmoid',
+                            recurrent_dropout=0.0, unroll=False, use_bias=True)
+        # Layers capture the global policy when they are created, so the mixed
+        # policy is only set around construction and the caller's is restored.
+        prev_policy = tf.keras.mixed_precision.global_policy()
+        if tf.config.list_physical_devices('GPU'):
+            print("GPU detected: LSTM will use the CuDNN kernel with mixed precision.")
+            # float16 compute / float32 variables runs on tensor cores; TF32
+            # covers the remaining float32 matmuls on Ampere+ GPUs.
+            tf.keras.mixed_precision.set_global_policy('mixed_float16')
+            tf.config.experimental.enable_tensor_float_32_execution(True)
+        try:
+            model = Sequential([
+                LSTM(64, return_sequences=True, input_shape=input_shape, **cudnn_kwargs),
+                Dropout(0.2),
+                LSTM(32, **cudnn_kwargs),
+                Dropout(0.2),
+                Dense(16, activation='relu'),
+                Dense(1, activation='linear', dtype='float32')  # keep the output in float32
+            ])
+        finally:
+            tf.keras.mixed_precision.set_global_policy(prev_policy)
         model.compile(optimizer='adam', loss='mse', metrics=['mae'])
         self.lstm_model = model
+        self._build_lstm_infer()
+
+    def _build_lstm_infer(self):
+        # Trace the forward pass once with a fixed input signature so repeated
+        # predict() calls reuse the same graph instead of retracing.
+        tf = _import_tf()
+        _, steps, feats = self.lstm_model.input_shape
+        lstm_model = self.lstm_model
+
+        @tf.function(input_signature=[tf.TensorSpec([None, steps, feats], tf.float32)])
+        def _lstm_infer(x):
+            return lstm_model(x, training=False)
+
+        self._lstm_infer = _lstm_infer
+
+    @staticmethod
+    def _float32_copy(model, unroll=False):
+        # Copy of the LSTM model computing in float32 with the same weights.
+        # A GPU-trained model keeps its mixed_float16 layer policy in the
+        # .keras file, and float16 compute is slow and lossy on CPU.
+        # unroll=True also unrolls the recurrent layers (for TFLite export).
+        tf = _import_tf()
+
+        def clone_layer(layer):
+            config = layer.get_config()
+            config["dtype"] = "float32"
+            if unroll and isinstance(layer, tf.keras.layers.LSTM):
+                config["unroll"] = True
+            return layer.__class__.from_config(config)
+
+        clone = tf.keras.models.clone_model(model, clone_function=clone_layer)
+        clone.set_weights(model.get_weights())
+        return clone
         
     def fit(self, X_seq, y):
         # X_seq shape: (samples, time_steps, features)
         # Prepare data for Tree models (Flatten: samples, time_steps*features)
+        # Sensor readings need no more than float32: halves memory traffic
+        # for every model and avoids a per-batch cast inside Keras.
+        X_seq = np.asarray(X_seq, dtype=np.float32)
+        y = np.asarray(y, dtype=np.float32)
         samples, steps, feats = X_seq.shape
         X_flat = X_seq.reshape(samples, steps * feats)
         
-        print("Training Random Forest...")
-        self.rf_model.fit(X_flat, y)
-        
-        print("Training XGBoost...")
-        self.xgb_model.fit(X_flat, y)
-        
-        print("Training LSTM...")
-        if self.lstm_model is None:
-            self.build_lstm((steps, feats))
-        
-        # Train LSTM with early stopping logic if needed, but for simplicity here standard fit
-        self.lstm_model.fit(X_seq, y, epochs=50, batch_size=32, verbose=0)
+        # The three models share no data dependency: fit the tree models in
+        # worker threads (both release the GIL in native code) while the main
+        # thread trains the LSTM. Each tree model gets half the cores so they
+        # do not oversubscribe the CPU.
+        n_jobs = max(1, (os.cpu_count() or 2) // 2)
+        self.xgb_model.set_params(n_jobs=n_jobs)
+
+        def fit_rf():
+            # HistGradientBoosting has no n_jobs; cap its OpenMP threads instead
+            with threadpool_limits(limits=n_jobs, user_api="openmp"):
+                self.rf_model.fit(X_flat, y)
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            print("Training HistGradientBoosting...")
+            rf_job = pool.submit(fit_rf)
+            print("Training XGBoost...")
+            xgb_job = pool.submit(self.xgb_model.fit, X_flat, y)
+
+            print("Training LSTM...")
+            if self.lstm_model is None:
+                self.build_lstm((steps, feats))
+
+            # Build the input pipeline once: cached after the first epoch and
+            # prefetched so batching overlaps with training. Stop once the
+            # training loss plateaus instead of always running 50 epochs.
+            tf = _import_tf()
+            ds = (tf.data.Dataset.from_tensor_slices((X_seq, y))
+                  .cache()
+                  .shuffle(1024)
+                  .batch(32)
+                  .prefetch(tf.data.AUTOTUNE))
+            early_stop = tf.keras.callbacks.EarlyStopping(monitor='loss', patience=5, restore_best_weights=True)
+            self.lstm_model.fit(ds, epochs=50, callbacks=[early_stop], verbose=0)
+
+            rf_job.result()
+            xgb_job.result()
+        self._booster = self.xgb_model.get_booster()
         
         self.is_trained = True
         print("Hybrid Training Complete.")
@@ -59,15 +184,16 @@ class HybridBiofilmPredictor:
         if not self.is_trained:
             raise Exception("Model not trained yet.")
             
+        X_seq = np.asarray(X_seq, dtype=np.float32)
         samples, steps, feats = X_seq.shape
         X_flat = X_seq.reshape(samples, steps * feats)
         
         # Get individual predictions
         pred_rf = self.rf_model.predict(X_flat)
-        pred_xgb = self.xgb_model.predict(X_flat)
+        # Predict on the raw Booster: no DMatrix copy, no sklearn-side validation
+        pred_xgb = self._booster.inplace_predict(X_flat)
         
-        # LSTM predict returns (samples, 1), flatten to (samples,)
-        pred_lstm = self.lstm_model.predict(X_seq, verbose=0).flatten()
+        pred_lstm = self._predict_lstm(X_seq)
         
         # Ensemble Average
         # You could also learn weights, but simple average is robust
@@ -75,17 +201,108 @@ class HybridBiofilmPredictor:
         
         return final_pred, (pred_rf, pred_xgb, pred_lstm)
 
+    def predict_one(self, x_seq):
+        """Predict a single window of shape (time_steps, features) or
+        (1, time_steps, features). Returns plain floats:
+        (final_pred, (pred_rf, pred_xgb, pred_lstm))."""
+        x_seq = np.asarray(x_seq, dtype=np.float32)
+        if x_seq.ndim == 2:
+            x_seq = x_seq[None, ...]
+        final_pred, preds = self.predict(x_seq)
+        return float(final_pred[0]), tuple(float(p[0]) for p in preds)
+
+    def predict_batch(self, X_seq, batch_size=1024):
+        """Predict many windows (samples, time_steps, features) in chunks of
+        batch_size to bound peak memory on long histories."""
+        chunks = [self.predict(X_seq[i:i + batch_size])
+                  for i in range(0, len(X_seq), batch_size)]
+        final_pred = np.concatenate([c[0] for c in chunks])
+        preds = tuple(np.concatenate([c[1][k] for c in chunks]) for k in range(3))
+        return final_pred, preds
+
+    def _predict_lstm(self, X_seq):
+        # Use the pre-traced graph: .predict() builds a tf.data pipeline per call,
+        # which dominates the cost for the single-sample monitor loop.
+        # Output is (samples, 1), flatten to (samples,)
+        return self._lstm_infer(np.asarray(X_seq, dtype=np.float32)).numpy().flatten()
+
+    def to_tflite(self, path):
+        # Export the LSTM for lightweight inference (see TFLiteHybrid).
+        # Dynamic-range quantization only: weights are stored as int8 but
+        # activations stay float. Calibrating activations to int8 collapsed
+        # the output onto a few dozen levels (errors of >10 risk points).
+        # The recurrent loop does not convert cleanly, so export an unrolled
+        # float32 copy of the LSTM layers carrying the trained weights.
+        tf = _import_tf()
+        export_model = self._float32_copy(self.lstm_model, unroll=True)
+
+        converter = tf.lite.TFLiteConverter.from_keras_model(export_model)
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        with open(path, "wb") as f:
+            f.write(converter.convert())
+
     def save(self, filepath):
-        # Save Scikit-Learn/XGBoost models using joblib
+        # Save Scikit-Learn model using joblib, XGBoost in its native binary format
         joblib.dump(self.rf_model, f"{filepath}_rf.pkl")
-        joblib.dump(self.xgb_model, f"{filepath}_xgb.pkl")
+        self.xgb_model.save_model(f"{filepath}_xgb.ubj")
         
         # Save Keras model
         if self.lstm_model:
             self.lstm_model.save(f"{filepath}_lstm.keras")
 
-    def load(self, filepath):
+    def _load_trees(self, filepath):
         self.rf_model = joblib.load(f"{filepath}_rf.pkl")
-        self.xgb_model = joblib.load(f"{filepath}_xgb.pkl")
-        self.lstm_model = tf.keras.models.load_model(f"{filepath}_lstm.keras")
+        if os.path.exists(f"{filepath}_xgb.ubj"):
+            self.xgb_model = xgb.XGBRegressor()
+            self.xgb_model.load_model(f"{filepath}_xgb.ubj")
+        else:
+            # Models saved before the switch to the native format
+            self.xgb_model = joblib.load(f"{filepath}_xgb.pkl")
+        self._booster = self.xgb_model.get_booster()
+
+    def load(self, filepath):
+        self._load_trees(filepath)
+        # compile=False: optimizer state is only needed for training
+        tf = _import_tf()
+        self.lstm_model = tf.keras.models.load_model(f"{filepath}_lstm.keras", compile=False)
+        if not tf.config.list_physical_devices('GPU') and any(
+                layer.compute_dtype != "float32" for layer in self.lstm_model.layers):
+            self.lstm_model = self._float32_copy(self.lstm_model)
+        self._build_lstm_infer()
+        self.is_trained = True
+
+
+class TFLiteHybrid(HybridBiofilmPredictor):
+    """Hybrid predictor that runs the LSTM through a TFLite interpreter.
+
+    Loads the tree models as usual and ``{filepath}_lstm.tflite`` (written by
+    ``HybridBiofilmPredictor.to_tflite``) instead of the Keras model, which
+    keeps start-up time and per-call latency low on edge devices.
+    """
+
+    def load(self, filepath):
+        try:
+            from ai_edge_litert.interpreter import Interpreter
+        except ImportError:
+            try:
+                from tflite_runtime.interpreter import Interpreter
+            except ImportError:
+                Interpreter = _import_tf().lite.Interpreter
+
+        self._load_trees(filepath)
+        self.interpreter = Interpreter(model_path=f"{filepath}_lstm.tflite")
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
         self.is_trained = True
+
+    def _predict_lstm(self, X_seq):
+        X_seq = np.asarray(X_seq, dtype=np.float32)
+        if tuple(self._input["shape"]) != X_seq.shape:
+            self.interpreter.resize_tensor_input(self._input["index"], X_seq.shape)
+            self.interpreter.allocate_tensors()
+            self._input = self.interpreter.get_input_details()[0]
+            self._output = self.interpreter.get_output_details()[0]
+        self.interpreter.set_tensor(self._input["index"], X_seq)
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self._output["index"]).flatten()
@@ -0,0 +1,78 @@
+import glob
+import hashlib
+import os
+
+import joblib
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    # numba is optional: decorated functions then run as plain Python.
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+
+# Bump when load_scaled() changes what it computes, so stale caches are ignored.
+PREPROCESS_VERSION = 1
+
+
+def load_scaled(path, features, target_col, scaler_cls):
+    """Return (scaled features, float32 target, fitted scaler) for the CSV at path.
+
+    The result is cached in the working directory. The file name encodes the
+    preprocessing (CSV path, columns, scaler class, PREPROCESS_VERSION) and
+    the CSV's mtime and size, so an unchanged dataset skips the CSV parse and
+    the scaler fit. Entries for an older version of the same CSV are removed
+    when a new one is written.
+    """
+    identity = repr((os.path.realpath(path), list(features), target_col,
+                     f"{scaler_cls.__module__}.{scaler_cls.__qualname__}",
+                     PREPROCESS_VERSION))
+    prefix = ".cache_" + hashlib.sha1(identity.encode()).hexdigest()[:12]
+    st = os.stat(path)
+    cache = f"{prefix}_{st.st_mtime_ns}_{st.st_size}"
+    if os.path.exists(cache + ".npz") and os.path.exists(cache + ".pkl"):
+        print(f"Using cached preprocessing ({cache}.npz)")
+        with np.load(cache + ".npz") as npz:
+            return npz["X"], npz["y"], joblib.load(cache + ".pkl")
+
+    import pandas as pd  # only needed on a cache miss
+
+    # Parse only the feature/target columns, straight to float32
+    df = pd.read_csv(path, usecols=list(features) + [target_col],
+                     dtype={c: np.float32 for c in list(features) + [target_col]})
+    scaler = scaler_cls()
+    # float32 throughout: what TF trains in, so no per-batch casts
+    X = scaler.fit_transform(df[features].to_numpy(np.float32)).astype(np.float32, copy=False)
+    y = df[target_col].to_numpy(np.float32)
+
+    for stale in glob.glob(prefix + "_*"):
+        os.remove(stale)
+    np.savez(cache + ".npz", X=X, y=y)
+    joblib.dump(scaler, cache + ".pkl")
+    return X, y, scaler
+
+
+# Seaborn's KDE overlay gets slow and memory-hungry on large samples:
+# subsample for the KDE and fall back to a plain histogram for huge inputs.
+KDE_MAX_POINTS = 20_000
+HIST_ONLY_POINTS = 100_000
+
+
+def plot_residuals(residuals, ax=None, bins=30, color=None):
+    # Imported here so callers pick the matplotlib backend first, and the
+    # monitor (which never plots) does not pay for the import.
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    residuals = np.asarray(residuals)
+    ax = ax if ax is not None else plt.gca()
+    if len(residuals) > HIST_ONLY_POINTS:
+        ax.hist(residuals, bins=bins, color=color)
+        return
+    if len(residuals) > KDE_MAX_POINTS:
+        residuals = np.random.default_rng(42).choice(residuals, KDE_MAX_POINTS, replace=False)
+    sns.histplot(residuals, bins=bins, kde=True, color=color, ax=ax)
@@ -1,82 +1,107 @@
+import os
 import pandas as pd
 import numpy as np
-import random
 
 # ===============================
 # CONFIG
 # ===============================
 NEW_ROWS = 1200  # Total new rows to generate
 OUTPUT_FILE = "dataset.csv"
+LABELS = ["LOW", "MEDIUM", "HIGH"]
 
 # ===============================
 # DATA GENERATION LOGIC
 # ===============================
-def generate_row():
+rng = np.random.default_rng()
+
+def generate_rows(n):
     # Scenario distribution:
     # 0: High Biofilm Risk — optimal CONDITIONS for biofilm (neutral pH, warm, stagnant) — 40%
     # 1: Low Biofilm Risk  — harsh/inhibiting conditions (extreme pH, high flow, cold)    — 40%
     # 2: Medium Biofilm Risk — mixed/transitional conditions                              — 15%
     # 3: Edge Cases — simulated sensor faults / noise / out-of-range values               — 5%
-    scenario = random.choices([0, 1, 2, 3], weights=[40, 40, 15, 5])[0]
+    scenario = rng.choice(4, size=n, p=[0.40, 0.40, 0.15, 0.05])
+
+    ph = np.empty(n)
+    temp = np.empty(n)
+    humidity = np.empty(n)
+    flow = np.empty(n)
+    turbidity = np.empty(n)
+    tds = np.empty(n)
 
     # --- SCENARIO 0: HIGH RISK ---
-    if scenario == 0:
-        ph = random.uniform(6.5, 7.8)          # Neutral pH ideal for bacteria
-        temp = random.uniform(25.0, 35.0)      # Warm temp
-        humidity = random.uniform(60.0, 90.0)  # High humidity
-        flow = random.uniform(0.0, 15.0)       # Stagnant/Low flow
-        turbidity = random.uniform(1000, 3000) # Dirty water
-        tds = random.uniform(500, 1500)        # High TDS
+    m = scenario == 0
+    k = m.sum()
+    ph[m] = rng.uniform(6.5, 7.8, k)          # Neutral pH ideal for bacteria
+    temp[m] = rng.uniform(25.0, 35.0, k)      # Warm temp
+    humidity[m] = rng.uniform(60.0, 90.0, k)  # High humidity
+    flow[m] = rng.uniform(0.0, 15.0, k)       # Stagnant/Low flow
+    turbidity[m] = rng.uniform(1000, 3000, k) # Dirty water
+    tds[m] = rng.uniform(500, 1500, k)        # High TDS
 
     # --- SCENARIO 1: LOW RISK ---
-    elif scenario == 1:
-        # Explicit defaults first, then override per sub-type
-        temp = random.uniform(20.0, 30.0)
-        humidity = random.uniform(30.0, 60.0)
-        turbidity = random.uniform(0.0, 200.0)  # Clear water
-        tds = random.uniform(50.0, 300.0)
-
-        sub_type = random.choice(['acidic', 'alkaline', 'high_flow', 'cold'])
-
-        if sub_type == 'acidic':
-            ph = random.uniform(3.0, 5.0)
-            flow = random.uniform(20.0, 50.0)
-        elif sub_type == 'alkaline':
-            ph = random.uniform(9.0, 12.0)
-            flow = random.uniform(20.0, 50.0)
-        elif sub_type == 'high_flow':
-            ph = random.uniform(6.0, 8.0)
-            flow = random.uniform(60.0, 100.0)  # Flushing effect
-        else:  # cold
-            ph = random.uniform(6.0, 8.0)
-            temp = random.uniform(5.0, 15.0)    # Override temp only
-            flow = random.uniform(10.0, 40.0)
+    m = scenario == 1
+    k = m.sum()
+    # Sub-types: 0 = acidic, 1 = alkaline, 2 = high_flow, 3 = cold
+    sub_type = np.full(n, -1)
+    sub_type[m] = rng.integers(0, 4, k)
+
+    # Shared values. Each row's temp is drawn exactly once: the default
+    # range here, or the cold range below, instead of draw-then-override.
+    not_cold = m & (sub_type != 3)
+    temp[not_cold] = rng.uniform(20.0, 30.0, not_cold.sum())
+    humidity[m] = rng.uniform(30.0, 60.0, k)
+    turbidity[m] = rng.uniform(0.0, 200.0, k)  # Clear water
+    tds[m] = rng.uniform(50.0, 300.0, k)
+
+    s = sub_type == 0  # acidic
+    ph[s] = rng.uniform(3.0, 5.0, s.sum())
+    flow[s] = rng.uniform(20.0, 50.0, s.sum())
+
+    s = sub_type == 1  # alkaline
+    ph[s] = rng.uniform(9.0, 12.0, s.sum())
+    flow[s] = rng.uniform(20.0, 50.0, s.sum())
+
+    s = sub_type == 2  # high_flow
+    ph[s] = rng.uniform(6.0, 8.0, s.sum())
+    flow[s] = rng.uniform(60.0, 100.0, s.sum())  # Flushing effect
+
+    s = sub_type == 3  # cold
+    ph[s] = rng.uniform(6.0, 8.0, s.sum())
+    temp[s] = rng.uniform(5.0, 15.0, s.sum())    # Cold water
+    flow[s] = rng.uniform(10.0, 40.0, s.sum())
 
     # --- SCENARIO 2: MEDIUM RISK ---
-    elif scenario == 2:
-        ph = random.uniform(5.5, 8.5)
-        temp = random.uniform(20.0, 30.0)
-        humidity = random.uniform(40.0, 70.0)
-        flow = random.uniform(15.0, 45.0)
-        turbidity = random.uniform(200, 1000)
-        tds = random.uniform(300, 800)
+    m = scenario == 2
+    k = m.sum()
+    ph[m] = rng.uniform(5.5, 8.5, k)
+    temp[m] = rng.uniform(20.0, 30.0, k)
+    humidity[m] = rng.uniform(40.0, 70.0, k)
+    flow[m] = rng.uniform(15.0, 45.0, k)
+    turbidity[m] = rng.uniform(200, 1000, k)
+    tds[m] = rng.uniform(300, 800, k)
 
     # --- SCENARIO 3: EDGE CASES (Sensor Faults) ---
-    else:
-        ph = random.choice([0.0, 14.0, -1.0]) if random.random() < 0.5 else random.uniform(6, 8)
-        temp = random.choice([0.0, 100.0]) if random.random() < 0.5 else random.uniform(25, 30)
-        humidity = 0.0
-        flow = 0.0
-        turbidity = 0.0
-        tds = 0.0
+    m = scenario == 3
+    k = m.sum()
+    ph[m] = np.where(rng.random(k) < 0.5,
+                     rng.choice([0.0, 14.0, -1.0], k),
+                     rng.uniform(6, 8, k))
+    temp[m] = np.where(rng.random(k) < 0.5,
+                       rng.choice([0.0, 100.0], k),
+                       rng.uniform(25, 30, k))
+    humidity[m] = 0.0
+    flow[m] = 0.0
+    turbidity[m] = 0.0
+    tds[m] = 0.0
 
     # Ensure constraints (physically impossible values clamped generally, but kept for edge cases if intended)
-    if scenario != 3:
-        ph = max(0, min(14, ph))
-        humidity = max(0, min(100, humidity))
-        flow = max(0, flow)
-        turbidity = max(0, turbidity)
-        tds = max(0, tds)
+    valid = scenario != 3
+    ph[valid] = np.clip(ph[valid], 0, 14)
+    humidity[valid] = np.clip(humidity[valid], 0, 100)
+    flow[valid] = np.maximum(0, flow[valid])
+    turbidity[valid] = np.maximum(0, turbidity[valid])
+    tds[valid] = np.maximum(0, tds[valid])
 
     # ===============================
     # GROUND TRUTH LOGIC (Risk Calculation)
@@ -89,22 +114,22 @@ def generate_row():
     # Temp: Bell curve (Optimal ~30-35)
     
     # 1. Flow Score (0-100) -> 0 flow = 100 risk
-    risk_flow = max(0, 100 - flow) 
+    risk_flow = np.maximum(0, 100 - flow)
     
     # 2. Turbidity Score (Scales log-ish)
-    risk_turb = min(100, (turbidity / 2000) * 100)
+    risk_turb = np.minimum(100, (turbidity / 2000) * 100)
     
     # 3. pH Score (Gaussian-like around 7)
     # Distance from 7.0. If |pH-7| > 3, risk is low.
-    dist_ph = abs(ph - 7.0)
-    risk_ph = max(0, 100 - (dist_ph * 30))
+    dist_ph = np.abs(ph - 7.0)
+    risk_ph = np.maximum(0, 100 - (dist_ph * 30))
     
     # 4. Temp Score (Optimal 30)
-    dist_temp = abs(temp - 30.0)
-    risk_temp = max(0, 100 - (dist_temp * 5))
+    dist_temp = np.abs(temp - 30.0)
+    risk_temp = np.maximum(0, 100 - (dist_temp * 5))
 
     # 5. TDS Score — high dissolved solids provide nutrients for biofilm
-    risk_tds = min(100, (tds / 1000) * 100)
+    risk_tds = np.minimum(100, (tds / 1000) * 100)
 
     # Weighted Sum
     # Flow and Turbidity are usually strong physical indicators
@@ -119,44 +144,45 @@ def generate_row():
     )
     
     # Add some random noise +/- 5%
-    final_risk += random.uniform(-5, 5)
-    final_risk = max(0, min(100, final_risk))
-
-    # Determine Label
-    if final_risk < 30:
-        label = "LOW"
-    elif final_risk < 60:
-        label = "MEDIUM"
-    else:
-        label = "HIGH"
-
-    return {
-        "ph": ph,
-        "temperature": temp,
-        "humidity": humidity,
-        "flow": flow,
-        "turbidity": turbidity,
-        "tds": tds,
-        "biofilm_risk_percent": final_risk,
+    final_risk += rng.uniform(-5, 5, n)
+    final_risk = np.clip(final_risk, 0, 100)
+
+    # Determine Label (categorical: int8 codes instead of Python strings)
+    label = pd.Categorical(
+        np.select([final_risk < 30, final_risk < 60], ["LOW", "MEDIUM"], default="HIGH"),
+        categories=LABELS)
+
+    return pd.DataFrame({
+        "ph": ph.astype(np.float32),
+        "temperature": temp.astype(np.float32),
+        "humidity": humidity.astype(np.float32),
+        "flow": flow.astype(np.float32),
+        "turbidity": turbidity.astype(np.float32),
+        "tds": tds.astype(np.float32),
+        "biofilm_risk_percent": final_risk.astype(np.float32),
         "biofilm_formation_label": label
-    }
+    })
 
 # ===============================
 # MAIN EXECUTION
 # ===============================
 print(f"Generating {NEW_ROWS} synthetic rows...")
-new_data = [generate_row() for _ in range(NEW_ROWS)]
-df_new = pd.DataFrame(new_data)
-
-# Read existing
-try:
-    df_old = pd.read_csv(OUTPUT_FILE)
-    df_combined = pd.concat([df_old, df_new], ignore_index=True)
-    print(f"Appended to existing dataset. New total rows: {len(df_combined)}")
-except FileNotFoundError:
-    df_combined = df_new
-    print(f"Created new dataset with {len(df_combined)} rows.")
-
-# Save
-df_combined.to_csv(OUTPUT_FILE, index=False)
+df_new = generate_rows(NEW_ROWS)
+
+# Append to the existing file instead of re-reading and rewriting it: the
+# historical rows stay byte-for-byte as they are, and the new float32 columns
+# are written at float32 precision.
+if os.path.exists(OUTPUT_FILE):
+    with open(OUTPUT_FILE) as f:
+        header = f.readline().strip().split(",")
+        old_rows = sum(1 for _ in f)
+    if sorted(header) != sorted(df_new.columns):
+        print(f"Error: {OUTPUT_FILE} has different columns: {header}")
+        exit(1)
+    df_new[header].to_csv(OUTPUT_FILE, mode="a", header=False, index=False)
+    print(f"Appended to existing dataset. New total rows: {old_rows + len(df_new)}")
+else:
+    df_new.to_csv(OUTPUT_FILE, index=False)
+    print(f"Created new dataset with {len(df_new)} rows.")
+
 print("Dataset updated successfully.")
@@ -1,3 +1,4 @@
+import os
 import pandas as pd
 import numpy as np
 import joblib
@@ -15,10 +16,14 @@ from sklearn.metrics import (
 # ===============================
 # LOAD DATASET
 # ===============================
-df = pd.read_csv("dataset.csv")
+FEATURES = ["ph", "temperature", "humidity", "flow", "turbidity", "tds"]
+TARGET_COL = "biofilm_risk_percent"
 
-X = df[["ph", "temperature", "humidity", "flow", "turbidity", "tds"]]
-y = df["biofilm_risk_percent"]
+df = pd.read_csv("dataset.csv", usecols=FEATURES + [TARGET_COL],
+                 dtype={c: np.float32 for c in FEATURES + [TARGET_COL]})
+
+X = df[FEATURES]
+y = df[TARGET_COL]
 
 # ===============================
 # TRAIN TEST SPLIT
@@ -34,6 +39,8 @@ xgb_reg = xgb.XGBRegressor(
     n_estimators=300,
     max_depth=6,
     learning_rate=0.1,
+    tree_method="hist",
+    device=os.environ.get("XGB_DEVICE", "cpu"),
     random_state=42,
     n_jobs=-1
 )
@@ -67,7 +74,7 @@ print("R²  :", r2)
 # ACTUAL vs PREDICTED
 # ===============================
 plt.figure(figsize=(6, 5))
-plt.scatter(y_test, y_pred, alpha=0.6)
+plt.scatter(y_test, y_pred, alpha=0.6, rasterized=True)
 plt.plot([0, 100], [0, 100], linestyle="--")
 plt.xlabel("Actual Risk (%)")
 plt.ylabel("Predicted Risk (%)")
@@ -1,16 +1,31 @@
+import os
+import sys
 import numpy as np
-import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
 import joblib
 import matplotlib.pyplot as plt
 from sklearn.preprocessing import MinMaxScaler
-from sklearn.neural_network import MLPRegressor
 from sklearn.metrics import mean_absolute_error, r2_score
 
+# Shared helpers live in the repository root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from biofilm_utils import load_scaled
+
+# Try importing tensorflow/keras
+try:
+    import tensorflow as tf
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import Dense, Input
+    from tensorflow.keras.callbacks import EarlyStopping
+except ImportError:
+    print("Error: TensorFlow is not installed. Please run `pip install tensorflow`.")
+    exit(1)
+
 # ===============================
 # CONFIG
 # ===============================
 DATA_FILE = "dataset_timeseries.csv"
-MODEL_FILE = "biofilm_mlp_model.pkl"
+MODEL_FILE = "biofilm_mlp_model.keras"
 SCALER_FILE = "scaler.pkl"
 SEQUENCE_LENGTH = 10  # Look back 10 steps
 TARGET_COL = "biofilm_risk_percent"
@@ -18,7 +33,7 @@ FEATURES = ["ph", "temperature", "humidity", "flow", "turbidity", "tds"]
 
 print(f"Loading {DATA_FILE}...")
 try:
-    df = pd.read_csv(DATA_FILE)
+    scaled_features, target, scaler = load_scaled(DATA_FILE, FEATURES, TARGET_COL, MinMaxScaler)
 except FileNotFoundError:
     print("Error: dataset_timeseries.csv not found. Run generate_timeseries.py first.")
     exit(1)
@@ -26,29 +41,21 @@ except FileNotFoundError:
 # ===============================
 # 1. PREPROCESSING
 # ===============================
-# Scale Features
-scaler = MinMaxScaler(feature_range=(0, 1))
-scaled_features = scaler.fit_transform(df[FEATURES])
-scaled_target = df[TARGET_COL].values / 100.0 # Normalize 0-100 to 0-1
+# Features are scaled by load_scaled()
+scaled_target = target / np.float32(100.0) # Normalize 0-100 to 0-1
 
 # Save scaler for real-time inference
 joblib.dump(scaler, SCALER_FILE)
 
 # Prepare Sliding Window Data
 # We flatten the sequence: [t-9, t-8 ... t] -> Single 1D vector of size (SequenceLength * NumFeatures)
-X = []
-y = []
-
 print(f"Creating sequences with length {SEQUENCE_LENGTH}...")
-for i in range(SEQUENCE_LENGTH, len(df)):
-    # Extract sequence of features
-    seq = scaled_features[i-SEQUENCE_LENGTH:i]
-    # Flatten it: (10, 6) -> (60,)
-    X.append(seq.flatten())
-    y.append(scaled_target[i])
-
-X = np.array(X)
-y = np.array(y)
+# Every window as a strided view (no Python loop); the last window has no
+# following target, so drop it.
+windows = sliding_window_view(scaled_features, (SEQUENCE_LENGTH, scaled_features.shape[1])).squeeze(1)
+# Flatten it: (10, 6) -> (60,)
+X = windows[:-1].reshape(len(windows) - 1, -1)
+y = scaled_target[SEQUENCE_LENGTH:]
 
 # Split
 split_idx = int(len(X) * 0.8)
@@ -60,28 +67,36 @@ print(f"Training shape: {X_train.shape}") # Should be (Samples, 60)
 # ===============================
 # 2. TRAIN MLP (Neural Network)
 # ===============================
-print("Training MLP Regressor (Neural Network)...")
+print("Training MLP (Neural Network)...")
+tf.keras.utils.set_random_seed(42)
 # 2 Hidden Layers: 64 neurons, 32 neurons
-mlp = MLPRegressor(
-    hidden_layer_sizes=(64, 32),
-    activation='relu',
-    solver='adam',
-    max_iter=500,
-    random_state=42,
-    early_stopping=True,
-    validation_fraction=0.1
+mlp = Sequential([
+    Input(shape=(X_train.shape[1],)),
+    Dense(64, activation='relu'),
+    Dense(32, activation='relu'),
+    Dense(1)
+])
+mlp.compile(optimizer='adam', loss='mse')
+
+# Large batches keep each step a single GEMM per layer
+early_stop = EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True)
+mlp.fit(
+    X_train, y_train,
+    epochs=500,  # upper bound, as MLPRegressor max_iter; early stopping ends it
+    batch_size=256,
+    validation_split=0.1,
+    callbacks=[early_stop],
+    verbose=1
 )
 
-mlp.fit(X_train, y_train)
-
 # Save
-joblib.dump(mlp, MODEL_FILE)
+mlp.save(MODEL_FILE)
 print(f"Model saved to {MODEL_FILE}")
 
 # ===============================
 # 3. EVALUATE
 # ===============================
-y_pred_scaled = mlp.predict(X_test)
+y_pred_scaled = mlp.predict(X_test, batch_size=1024, verbose=0).flatten()
 
 # Inverse transform target
 y_test_real = y_test * 100.0
@@ -1,4 +1,3 @@
-import collections
 import os
 import random
 import sys
@@ -8,6 +7,8 @@ from urllib.parse import urlparse
 import joblib
 import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 try:
     from dotenv import load_dotenv
@@ -16,7 +17,8 @@ except ImportError:
 
 # Ensure local directory is in path before importing the model class.
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from biofilm_models import HybridBiofilmPredictor
+from biofilm_models import HybridBiofilmPredictor, TFLiteHybrid
+from biofilm_utils import njit
 
 
 if load_dotenv is not None:
@@ -58,27 +60,19 @@ THINGSPEAK_API_KEY = os.getenv("THINGSPEAK_API_KEY", "YOUR_API_KEY")
 THINGSPEAK_URL = f"https://api.thingspeak.com/update?api_key={THINGSPEAK_API_KEY}"
 
 MODEL_PATH = "biofilm_hybrid_model"
+TFLITE_PATH = f"{MODEL_PATH}_lstm.tflite"
 SCALER_PATH = "scaler_hybrid.pkl"
 SEQUENCE_LENGTH = 10
 FEATURES_ORDER = ["ph", "temperature", "humidity", "flow", "turbidity", "tds"]
 
-history_buffer = collections.deque(maxlen=SEQUENCE_LENGTH)
-
 # Configurable water system volume for dosage calculations
 WATER_VOLUME_LITERS = int(os.getenv("WATER_VOLUME_LITERS", "1000"))
 
-MODEL_LOADED = False
-try:
-    predictor = HybridBiofilmPredictor()
-    predictor.load(MODEL_PATH)
-    scaler = joblib.load(SCALER_PATH)
-    MODEL_LOADED = True
-    print("[OK] Model and scaler loaded successfully.")
-except Exception as e:
-    print(f"[ERROR] Failed to load model: {e}")
-    print("[WARN] Continuing in sensor-data-only mode (risk will be 0 until model is available).")
-    predictor = None
-    scaler = None
+# One pooled session for the whole process: keep-alive reuses the TCP/TLS
+# connections to the ESP32 and ThingSpeak instead of reconnecting every cycle.
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=4,
+                                      max_retries=Retry(total=2, backoff_factor=0.2)))
 
 if THINGSPEAK_API_KEY == "YOUR_API_KEY" or not THINGSPEAK_API_KEY:
     print("[WARN] ThingSpeak API key is not set or is using the default value in .env.")
@@ -318,24 +312,6 @@ def print_dosage(recommendations):
 # =============================================================================
 # SENSOR DATA
 # =============================================================================
-def get_sensor_data():
-    try:
-        print(f"[INFO] Attempting to fetch data from: {URL_SENSOR}...", end="\r")
-        response = requests.get(URL_SENSOR, timeout=5)
-        if response.status_code == 200:
-            return response.json()
-
-        print(f"\n[ERROR] ESP32 returned status code: {response.status_code}")
-    except requests.exceptions.ConnectTimeout:
-        print(f"\n[ERROR] Connection timeout: could not reach ESP32 at {URL_SENSOR}. Check the IP and device power.")
-    except requests.exceptions.ConnectionError:
-        print(f"\n[ERROR] Connection error: network unreachable or ESP32 refused connection at {URL_SENSOR}.")
-    except Exception as e:
-        print(f"\n[ERROR] Unexpected error fetching sensor data: {e}")
-
-    return None
-
-
 class Simulator:
     def __init__(self):
         self.ph = 7.0
@@ -371,13 +347,6 @@ class Simulator:
         }
 
 
-sim = Simulator()
-SIMULATION_MODE = False
-
-# Instantiate the trend analyzer
-trend_analyzer = TrendAnalyzer(min_window=3)
-
-
 def send_to_thingspeak(data, risk_val, status_code, ensemble_preds=None):
     payload = {
         "field1": data["ph"],
@@ -391,7 +360,7 @@ def send_to_thingspeak(data, risk_val, status_code, ensemble_preds=None):
     }
 
     try:
-        response = requests.post(THINGSPEAK_URL, data=payload, timeout=5)
+        response = session.post(THINGSPEAK_URL, data=payload, timeout=5)
         if response.status_code == 200:
             print(f"[OK] Sent to ThingSpeak (ID: {response.text}) | Risk: {risk_val:.1f}%")
             if ensemble_preds:
@@ -399,51 +368,129 @@ def send_to_thingspeak(data, risk_val, status_code, ensemble_preds=None):
                 rf_val = rf[0] if hasattr(rf, "__getitem__") else rf
                 xgb_val = xgb_p[0] if hasattr(xgb_p, "__getitem__") else xgb_p
                 lstm_val = lstm[0] if hasattr(lstm, "__getitem__") else lstm
-                print(f"   [Ensemble] RF: {rf_val:.1f}% | XGB: {xgb_val:.1f}% | LSTM: {lstm_val:.1f}%")
+                print(f"   [Ensemble] HistGB: {rf_val:.1f}% | XGB: {xgb_val:.1f}% | LSTM: {lstm_val:.1f}%")
         else:
             print(f"[WARN] ThingSpeak error: {response.status_code}")
     except Exception as e:
         print(f"[ERROR] ThingSpeak exception: {e}")
 
 
-print("\n[INFO] Starting Biofilm Risk Monitor (Hybrid Ensemble)...")
-print(f"[INFO] Water system volume: {WATER_VOLUME_LITERS} L (set WATER_VOLUME_LITERS env to change)")
+# =============================================================================
+# MONITOR
+# =============================================================================
 INTERVAL_SEC = 16
 
-try:
-    while True:
-        raw_data = get_sensor_data()
+
+@njit(cache=True)
+def scale_row(x, scale, offset, out):
+    # MinMax scaling of one reading, written straight into the scaled buffer.
+    for i in range(x.shape[0]):
+        out[i] = x[i] * scale[i] + offset[i]
+
+
+class Monitor:
+    """Long-lived monitor process. The model and scaler are loaded once at
+    start-up and kept in memory, so sensor outages never trigger a reload."""
+
+    def __init__(self):
+        # Ring buffer of the last SEQUENCE_LENGTH readings, preallocated once.
+        self._hist = np.zeros((SEQUENCE_LENGTH, len(FEATURES_ORDER)), dtype=np.float32)
+        self._hist_scaled = np.zeros_like(self._hist)
+        self._head = 0
+        self._fill = 0
+        self._scale = None
+        self._offset = None
+        self.sim = Simulator()
+        self.simulation_mode = False
+        self.trend_analyzer = TrendAnalyzer(min_window=3)
+        self.predictor = None
+        self.scaler = None
+        self.model_loaded = False
+        self.load_model()
+
+    def load_model(self):
+        try:
+            # Prefer the TFLite export of the LSTM when present: much faster start-up
+            # and per-reading inference than the full Keras runtime.
+            if os.path.exists(TFLITE_PATH):
+                predictor = TFLiteHybrid()
+            else:
+                predictor = HybridBiofilmPredictor()
+            predictor.load(MODEL_PATH)
+            self.scaler = joblib.load(SCALER_PATH)
+            # Scaling is applied per reading by scale_row(); keep the fitted
+            # MinMax parameters as contiguous float32 arrays.
+            self._scale = np.asarray(self.scaler.scale_, dtype=np.float32)
+            self._offset = np.asarray(self.scaler.min_, dtype=np.float32)
+            self.predictor = predictor
+            self.model_loaded = True
+            print("[OK] Model and scaler loaded successfully.")
+        except Exception as e:
+            print(f"[ERROR] Failed to load model: {e}")
+            print("[WARN] Continuing in sensor-data-only mode (risk will be 0 until model is available).")
+
+    def push_reading(self, features):
+        self._hist[self._head] = features
+        if self.model_loaded:
+            scale_row(self._hist[self._head], self._scale, self._offset, self._hist_scaled[self._head])
+        self._head = (self._head + 1) % SEQUENCE_LENGTH
+        self._fill = min(self._fill + 1, SEQUENCE_LENGTH)
+
+    def history(self):
+        """Buffered readings in chronological order, shape (n_readings, n_features)."""
+        return np.roll(self._hist, -self._head, axis=0)[SEQUENCE_LENGTH - self._fill:]
+
+    def scaled_history(self):
+        """Scaled counterpart of history() for a full buffer."""
+        return np.roll(self._hist_scaled, -self._head, axis=0)
+
+    def get_sensor_data(self):
+        try:
+            print(f"[INFO] Attempting to fetch data from: {URL_SENSOR}...", end="\r")
+            response = session.get(URL_SENSOR, timeout=5)
+            if response.status_code == 200:
+                return response.json()
+
+            print(f"\n[ERROR] ESP32 returned status code: {response.status_code}")
+        except requests.exceptions.ConnectTimeout:
+            print(f"\n[ERROR] Connection timeout: could not reach ESP32 at {URL_SENSOR}. Check the IP and device power.")
+        except requests.exceptions.ConnectionError:
+            print(f"\n[ERROR] Connection error: network unreachable or ESP32 refused connection at {URL_SENSOR}.")
+        except Exception as e:
+            print(f"\n[ERROR] Unexpected error fetching sensor data: {e}")
+
+        return None
+
+    def step(self):
+        raw_data = self.get_sensor_data()
 
         if raw_data:
             print(f"[INFO] Sensor data: {raw_data}")
-            SIMULATION_MODE = False
+            self.simulation_mode = False
         else:
-            if not SIMULATION_MODE:
+            if not self.simulation_mode:
                 print("[WARN] Sensor offline. Switching to simulation mode.")
-                SIMULATION_MODE = True
+                self.simulation_mode = True
 
-            raw_data = sim.get_next_reading()
+            raw_data = self.sim.get_next_reading()
             print(f"[INFO] Simulated: {raw_data}")
 
-        features = [raw_data[f] for f in FEATURES_ORDER]
-        history_buffer.append(features)
+        self.push_reading([raw_data[f] for f in FEATURES_ORDER])
+        history = self.history()
 
         # --- Trend Analysis (runs as soon as we have 3+ readings) ---
-        trend_alerts = trend_analyzer.analyze(history_buffer)
+        trend_alerts = self.trend_analyzer.analyze(history)
         TrendAnalyzer.print_alerts(trend_alerts)
 
         risk = 0.0
         status_code = 1
         ensemble_debug = None
 
-        if len(history_buffer) == SEQUENCE_LENGTH and MODEL_LOADED:
-            seq_array = np.array(history_buffer)
-            seq_scaled = scaler.transform(seq_array)
-            input_seq = seq_scaled.reshape(1, SEQUENCE_LENGTH, len(FEATURES_ORDER))
+        if self._fill == SEQUENCE_LENGTH and self.model_loaded:
+            seq_scaled = self.scaled_history()
 
             try:
-                pred_val, (p_rf, p_xgb, p_lstm) = predictor.predict(input_seq)
-                risk = float(pred_val if np.isscalar(pred_val) else pred_val[0])
+                risk, (p_rf, p_xgb, p_lstm) = self.predictor.predict_one(seq_scaled)
                 risk = max(0.0, min(100.0, risk))
                 ensemble_debug = (p_rf, p_xgb, p_lstm)
 
@@ -455,11 +502,11 @@ try:
                     status_code = 3
             except Exception as e:
                 print(f"[ERROR] Prediction error: {e}")
-        elif not MODEL_LOADED:
+        elif not self.model_loaded:
             print("[WARN] Model not loaded - skipping prediction. Sensor data is still uploaded.")
             risk = 0
         else:
-            print(f"[INFO] Gathering history... ({len(history_buffer)}/{SEQUENCE_LENGTH})")
+            print(f"[INFO] Gathering history... ({self._fill}/{SEQUENCE_LENGTH})")
             risk = 0
 
         # --- Escalate status if critical trend alerts detected ---
@@ -468,7 +515,7 @@ try:
             status_code = 2  # Bump to WARNING if trend analysis detects critical patterns
 
         # --- Encode Simulation Mode ---
-        if SIMULATION_MODE:
+        if self.simulation_mode:
             status_code = -abs(status_code) if status_code != 0 else -1
 
         # --- Chemical Dosage Recommendations ---
@@ -476,14 +523,26 @@ try:
         print_dosage(dosage_recs)
 
         send_to_thingspeak(raw_data, risk, status_code, ensemble_debug)
-        time.sleep(INTERVAL_SEC)
 
-except KeyboardInterrupt:
-    print("\n[INFO] Stopping...")
-    try:
-        final_payload = {"field8": 0}
-        requests.post(THINGSPEAK_URL, data=final_payload, timeout=2)
-        print("Sent shutdown signal (status 0).")
-    except Exception:
-        pass
-    print("Exited.")
+    def run(self):
+        print("\n[INFO] Starting Biofilm Risk Monitor (Hybrid Ensemble)...")
+        print(f"[INFO] Water system volume: {WATER_VOLUME_LITERS} L (set WATER_VOLUME_LITERS env to change)")
+
+        try:
+            while True:
+                self.step()
+                time.sleep(INTERVAL_SEC)
+
+        except KeyboardInterrupt:
+            print("\n[INFO] Stopping...")
+            try:
+                final_payload = {"field8": 0}
+                session.post(THINGSPEAK_URL, data=final_payload, timeout=2)
+                print("Sent shutdown signal (status 0).")
+            except Exception:
+                pass
+            print("Exited.")
+
+
+if __name__ == "__main__":
+    Monitor().run()
@@ -1,10 +1,17 @@
-import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import joblib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error, r2_score
-from biofilm_models import HybridBiofilmPredictor
+from biofilm_models import HybridBiofilmPredictor, TFLiteHybrid, FastMinMax
+from biofilm_utils import load_scaled, plot_residuals
 import os
+import matplotlib
+matplotlib.use('Agg')  # plots are only written to PNG, also from worker processes
+import matplotlib.pyplot as plt
+import seaborn as sns
 
 # ===============================
 # CONFIGURATION
@@ -13,112 +20,25 @@ DATA_PATH = "dataset_timeseries.csv"
 MODEL_PATH = "biofilm_hybrid_model"
 SEQ_LENGTH = 10
 FEATURES = ['ph', 'temperature', 'humidity', 'flow', 'turbidity', 'tds']
+TARGET_COL = 'biofilm_risk_percent'
 
-# ===============================
-# LOAD & PROCESS DATA
-# ===============================
-print("Loading Time-Series Dataset...")
-if not os.path.exists(DATA_PATH):
-    print("Error: dataset_timeseries.csv not found.")
-    exit(1)
-
-df = pd.read_csv(DATA_PATH)
-target_col = 'biofilm_risk_percent'
-
-# Features to use
-feature_cols = ['ph', 'temperature', 'humidity', 'flow', 'turbidity', 'tds']
-data = df[feature_cols].values
-target = df[target_col].values
-
-# Scale Features (Crucial for LSTM)
-from sklearn.preprocessing import MinMaxScaler
-scaler = MinMaxScaler(feature_range=(0, 1))
-data_scaled = scaler.fit_transform(data)
-
-# Save scaler for inference later
-joblib.dump(scaler, "scaler_hybrid.pkl")
-
-# Create Sliding Windows
-X_seq = []
-y_seq = []
-
-print(f"Creating sequences of length {SEQ_LENGTH}...")
-for i in range(SEQ_LENGTH, len(data_scaled)):
-    # Input: Window of past 10 steps (t-10 to t-1)
-    # Output: Correlation to current risk (at t)
-    # Or predictive: (t-9 to t) -> (t+1)?
-    # Let's align with test.py which likely uses past 10 to predict CURRENT state risk
-    X_seq.append(data_scaled[i-SEQ_LENGTH:i]) 
-    y_seq.append(target[i])
+# Worker processes take ~2 s to start (they re-import this module), so the
+# per-model plots are only rendered in parallel for large test sets.
+PARALLEL_PLOT_MIN_POINTS = 100_000
 
-X_seq = np.array(X_seq)
-y_seq = np.array(y_seq)
-
-print(f"Data Shape: {X_seq.shape}")
-
-# Train/Test Split (Time Series Split - No Shuffle to prevent leakage)
-# Using simple index split for time series
-split_idx = int(len(X_seq) * 0.8)
-X_train, X_test = X_seq[:split_idx], X_seq[split_idx:]
-y_train, y_test = y_seq[:split_idx], y_seq[split_idx:]
-
-print(f"Train samples: {len(X_train)}, Test samples: {len(X_test)}")
-
-
-# ===============================
-# TRAIN HYBRID MODEL
-# ===============================
-print("\nInitializing Hybrid Ensemble (RF + XGB + LSTM)...")
-model = HybridBiofilmPredictor()
-
-print("Starting Training...")
-model.fit(X_train, y_train)
-
-# ===============================
-# EVALUATION
-# ===============================
-print("\nEvaluating on Test Set...")
-y_pred, (p_rf, p_xgb, p_lstm) = model.predict(X_test)
-
-r2_ensemble = r2_score(y_test, y_pred)
-mae_ensemble = mean_absolute_error(y_test, y_pred)
-
-print("-" * 40)
-print(f"Hybrid Ensemble R²: {r2_ensemble:.4f}")
-print(f"Hybrid Ensemble MAE: {mae_ensemble:.4f}")
-print("-" * 40)
-print(f"Individual R² Scores:")
-print(f"  Random Forest: {r2_score(y_test, p_rf):.4f}")
-print(f"  XGBoost:       {r2_score(y_test, p_xgb):.4f}")
-print(f"  LSTM:          {r2_score(y_test, p_lstm):.4f}")
-print("-" * 40)
-
-# ===============================
-# SAVE MODEL
-# ===============================
-print(f"Saving Hybrid Model to {MODEL_PATH}...")
-model.save(MODEL_PATH)
-
-# ===============================
-# VISUALIZATION
-# ===============================
-import matplotlib.pyplot as plt
-import seaborn as sns
-
-print("Generating detailed evaluation plots...")
-
-def plot_model_performance(y_true, y_pred, model_name, color, filename):
+def plot_model_performance(y_true, y_pred, model_name, color, filename,
+                           precomputed_r2=None, precomputed_mae=None):
     # Ensure 1D arrays
     if not np.isscalar(y_pred[0]): y_pred = y_pred.flatten()
     
-    r2 = r2_score(y_true, y_pred)
-    mae = mean_absolute_error(y_true, y_pred)
+    r2 = precomputed_r2 if precomputed_r2 is not None else r2_score(y_true, y_pred)
+    mae = precomputed_mae if precomputed_mae is not None else mean_absolute_error(y_true, y_pred)
     
     plt.figure(figsize=(14, 6))
     
     # 1. Actual vs Predicted
     plt.subplot(1, 2, 1)
-    plt.scatter(y_true, y_pred, alpha=0.5, color=color, label='Prediction')
+    plt.scatter(y_true, y_pred, alpha=0.5, color=color, label='Prediction', rasterized=True)
     plt.plot([0, 100], [0, 100], 'r--', lw=2, label='Ideal Fit')
     plt.xlabel('Actual Risk (%)')
     plt.ylabel('Predicted Risk (%)')
@@ -129,7 +49,7 @@ def plot_model_performance(y_true, y_pred, model_name, color, filename):
     # 2. Residual Distribution
     plt.subplot(1, 2, 2)
     residuals = y_true - y_pred
-    sns.histplot(residuals, bins=30, kde=True, color=color)
+    plot_residuals(residuals, color=color)
     plt.axvline(0, color='r', linestyle='--')
     plt.xlabel('Residual Error')
     plt.title(f'{model_name} - Residual Error Distribution')
@@ -140,26 +60,140 @@ def plot_model_performance(y_true, y_pred, model_name, color, filename):
     print(f"Saved {filename}")
     plt.close()
 
-# Generate Individual Plots
-plot_model_performance(y_test, p_rf, "Random Forest", "green", "eval_random_forest.png")
-plot_model_performance(y_test, p_xgb, "XGBoost", "orange", "eval_xgboost.png")
-plot_model_performance(y_test, p_lstm, "LSTM", "purple", "eval_lstm.png")
-plot_model_performance(y_test, y_pred, "Hybrid Ensemble", "blue", "eval_hybrid_ensemble.png")
-
-# Summary Comparison Bar Chart
-plt.figure(figsize=(10, 6))
-models_list = ['Random Forest', 'XGBoost', 'LSTM', 'Hybrid Ensemble']
-r2_list = [r2_score(y_test, p_rf), r2_score(y_test, p_xgb), r2_score(y_test, p_lstm), r2_ensemble]
-
-sns.barplot(x=models_list, y=r2_list, palette='viridis', hue=models_list, legend=False)
-plt.ylim(0, 1.1)
-plt.ylabel('R² Score')
-plt.title('Model Performance Comparison Summary')
-for i, v in enumerate(r2_list):
-    plt.text(i, v + 0.02, f"{v:.3f}", ha='center', fontweight='bold')
-
-plt.tight_layout()
-plt.savefig('eval_comparison_summary.png')
-print("Saved eval_comparison_summary.png")
-
-print("All evaluations complete.")
+
+def main():
+    # ===============================
+    # LOAD & PROCESS DATA
+    # ===============================
+    print("Loading Time-Series Dataset...")
+    if not os.path.exists(DATA_PATH):
+        print("Error: dataset_timeseries.csv not found.")
+        exit(1)
+
+    # Scale Features (Crucial for LSTM)
+    data_scaled, target, scaler = load_scaled(DATA_PATH, FEATURES, TARGET_COL, FastMinMax)
+
+    # Save scaler for inference later
+    joblib.dump(scaler, "scaler_hybrid.pkl")
+
+    # Create Sliding Windows
+    print(f"Creating sequences of length {SEQ_LENGTH}...")
+    # Input: Window of past 10 steps (t-10 to t-1)
+    # Output: Correlation to current risk (at t)
+    # Let's align with test.py which uses past 10 to predict CURRENT state risk
+    # sliding_window_view is a strided view over data_scaled: no Python loop and
+    # no per-window copy. The last window has no following target, so drop it.
+    windows = sliding_window_view(data_scaled, (SEQ_LENGTH, data_scaled.shape[1])).squeeze(1)
+    X_seq = windows[:-1]
+    y_seq = target[SEQ_LENGTH:]  # already float32 (load_scaled)
+
+    print(f"Data Shape: {X_seq.shape}")
+
+    # Train/Test Split (Time Series Split - No Shuffle to prevent leakage)
+    # Using simple index split for time series
+    split_idx = int(len(X_seq) * 0.8)
+    X_train, X_test = X_seq[:split_idx], X_seq[split_idx:]
+    y_train, y_test = y_seq[:split_idx], y_seq[split_idx:]
+
+    print(f"Train samples: {len(X_train)}, Test samples: {len(X_test)}")
+
+
+    # ===============================
+    # TRAIN HYBRID MODEL
+    # ===============================
+    print("\nInitializing Hybrid Ensemble (HistGB + XGB + LSTM)...")
+    model = HybridBiofilmPredictor()
+
+    print("Starting Training...")
+    model.fit(X_train, y_train)
+
+    # ===============================
+    # EVALUATION
+    # ===============================
+    print("\nEvaluating on Test Set...")
+    y_pred, (p_rf, p_xgb, p_lstm) = model.predict_batch(X_test, batch_size=1024)
+
+    # Score every model once; the printout and all plots below reuse these
+    preds = {"HistGB": p_rf, "XGBoost": p_xgb, "LSTM": p_lstm, "Hybrid Ensemble": y_pred}
+    r2s = {name: r2_score(y_test, p) for name, p in preds.items()}
+    maes = {name: mean_absolute_error(y_test, p) for name, p in preds.items()}
+    r2_ensemble = r2s["Hybrid Ensemble"]
+    mae_ensemble = maes["Hybrid Ensemble"]
+
+    print("-" * 40)
+    print(f"Hybrid Ensemble R²: {r2_ensemble:.4f}")
+    print(f"Hybrid Ensemble MAE: {mae_ensemble:.4f}")
+    print("-" * 40)
+    print(f"Individual R² Scores:")
+    print(f"  HistGB:        {r2s['HistGB']:.4f}")
+    print(f"  XGBoost:       {r2s['XGBoost']:.4f}")
+    print(f"  LSTM:          {r2s['LSTM']:.4f}")
+    print("-" * 40)
+
+    # ===============================
+    # SAVE MODEL
+    # ===============================
+    print(f"Saving Hybrid Model to {MODEL_PATH}...")
+    model.save(MODEL_PATH)
+    print(f"Exporting TFLite LSTM to {MODEL_PATH}_lstm.tflite...")
+    model.to_tflite(f"{MODEL_PATH}_lstm.tflite")
+
+    # test.py serves the TFLite LSTM whenever the file exists, so score the
+    # exported model too rather than only the Keras one.
+    deployed = TFLiteHybrid()
+    deployed.load(MODEL_PATH)
+    y_pred_lite, (_, _, p_lstm_lite) = deployed.predict_batch(X_test, batch_size=1024)
+    print("-" * 40)
+    print("Deployed (TFLite) scores:")
+    print(f"  Ensemble R²:   {r2_score(y_test, y_pred_lite):.4f}  MAE: {mean_absolute_error(y_test, y_pred_lite):.4f}")
+    print(f"  LSTM R²:       {r2_score(y_test, p_lstm_lite):.4f}  MAE: {mean_absolute_error(y_test, p_lstm_lite):.4f}")
+    print(f"  Max |TFLite - Keras| LSTM output: {np.abs(p_lstm_lite - p_lstm).max():.4f}")
+    print("-" * 40)
+
+    # ===============================
+    # VISUALIZATION
+    # ===============================
+    print("Generating detailed evaluation plots...")
+
+    # Generate Individual Plots
+    plots = [("HistGB", "green", "eval_histgb.png"),
+             ("XGBoost", "orange", "eval_xgboost.png"),
+             ("LSTM", "purple", "eval_lstm.png"),
+             ("Hybrid Ensemble", "blue", "eval_hybrid_ensemble.png")]
+    names, colors, filenames = zip(*plots)
+    plot_args = ([y_test] * len(plots), [preds[n] for n in names], names, colors, filenames,
+                 [r2s[n] for n in names], [maes[n] for n in names])
+    n_workers = min(len(plots), os.cpu_count() or 1)
+    if n_workers > 1 and len(y_test) >= PARALLEL_PLOT_MIN_POINTS:
+        # The figures are independent: render them in worker processes (pyplot
+        # is not thread-safe). "spawn" avoids forking a process that already
+        # runs TensorFlow threads.
+        with ProcessPoolExecutor(max_workers=n_workers,
+                                 mp_context=multiprocessing.get_context("spawn")) as ex:
+            list(ex.map(plot_model_performance, *plot_args))
+    else:
+        for args in zip(*plot_args):
+            plot_model_performance(*args)
+
+    # Summary Comparison Bar Chart
+    plt.figure(figsize=(10, 6))
+    models_list = list(r2s.keys())
+    r2_list = list(r2s.values())
+
+    sns.barplot(x=models_list, y=r2_list, palette='viridis', hue=models_list, legend=False)
+    plt.ylim(0, 1.1)
+    plt.ylabel('R² Score')
+    plt.title('Model Performance Comparison Summary')
+    for i, v in enumerate(r2_list):
+        plt.text(i, v + 0.02, f"{v:.3f}", ha='center', fontweight='bold')
+
+    plt.tight_layout()
+    plt.savefig('eval_comparison_summary.png')
+    print("Saved eval_comparison_summary.png")
+    plt.close()
+
+    print("All evaluations complete.")
+
+
+if __name__ == "__main__":
+    main()